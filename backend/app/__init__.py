@@ -16,6 +16,9 @@ def create_app(config_class=Config):
     db.init_app(app)
     login_manager.init_app(app)
     
+    from app.cache import init_questionnaire_cache
+    init_questionnaire_cache(app)
+    
     # Configure CORS to allow all origins during development
     CORS(app)
     
@@ -26,8 +29,40 @@ def create_app(config_class=Config):
     app.register_blueprint(responses.bp)
     app.register_blueprint(analytics.bp)
     
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create database tables and indexes and migrate existing data"""
+        migrate_schema()
+        print('Database schema is up to date.')
+    
     # Create database tables
-    with app.app_context():
-        db.create_all()
+    if app.config.get('SCHEMA_CHECK_ON_STARTUP', True):
+        with app.app_context():
+            init_schema()
+    
+    from app.write_behind import init_write_behind
+    init_write_behind(app)
     
     return app
+
+def init_schema():
+    """Create missing tables and the (empty) answer search index; cheap enough for startup"""
+    from app.archive import check_monotonic_response_ids
+    from app.search import init_answer_index
+    from app.write_behind import init_write_behind_schema
+    
+    db.create_all()
+    check_monotonic_response_ids()
+    init_answer_index()
+    init_write_behind_schema()
+    db.session.commit()
+
+def migrate_schema():
+    """Bring existing data up to date; only run from `flask init-db`, never on startup"""
+    from app.archive import ensure_monotonic_response_ids
+    from app.search import backfill_answer_index
+    
+    init_schema()
+    ensure_monotonic_response_ids()
+    backfill_answer_index()
+    db.session.commit()
@@ -0,0 +1,308 @@
+import logging
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Cold responses are stored as zstd-compressed Arrow IPC files, one directory
+# per questionnaire and one file per archive run:
+#   <RESPONSE_ARCHIVE_DIR>/questionnaire_<id>/responses-<timestamp>-<min id>-<max id>.arrow
+# Analytics paths read every row anyway. Lookups by id skip files whose id
+# range can't match, and lookups by id/user read only the filter column of a
+# file before decompressing the rest. pyarrow is only imported when an
+# archive is written or actually present.
+#
+# Archived responses keep their ids, so the response table uses AUTOINCREMENT
+# to make sure SQLite never hands those ids out again (tables created before
+# that are rebuilt by `flask init-db`). Archived answers are
+# removed from the search index: search covers hot responses only.
+
+ARCHIVE_COLUMNS = (
+    'id', 'questionnaire_id', 'user_id', 'answers',
+    'started_at', 'submitted_at', 'completion_time'
+)
+
+# Files written before ids were recorded in the name have no range
+_PARTITION_RE = re.compile(r'responses-\d+-(\d+)-(\d+)\.arrow$')
+
+def archive_dir():
+    return current_app.config.get('RESPONSE_ARCHIVE_DIR') or \
+        os.path.join(current_app.instance_path, 'response_archive')
+
+def partition_dir(questionnaire_id):
+    return os.path.join(archive_dir(), 'questionnaire_%d' % questionnaire_id)
+
+def partition_files(questionnaire_id):
+    path = partition_dir(questionnaire_id)
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.endswith('.arrow')
+    )
+
+def all_partition_files():
+    root = archive_dir()
+    if not os.path.isdir(root):
+        return []
+    return [
+        path
+        for name in sorted(os.listdir(root)) if name.startswith('questionnaire_')
+        for path in partition_files(int(name[len('questionnaire_'):]))
+    ]
+
+def load_archived_responses(questionnaire_id, exclude=()):
+    """Read archived responses as transient Response objects"""
+    return _read_partitions(partition_files(questionnaire_id), exclude=exclude)
+
+def find_archived_responses(column, value):
+    """Archived responses (any questionnaire) whose column equals value"""
+    files = all_partition_files()
+    if column == 'id':
+        files = [path for path in files if _id_range(path) is None or
+                 _id_range(path)[0] <= value <= _id_range(path)[1]]
+    return _read_partitions(files, column=column, value=value)
+
+def all_responses(questionnaire_id):
+    """Hot responses from the database followed by archived ones"""
+    from app.models.response import Response
+
+    hot = Response.query.filter_by(questionnaire_id=questionnaire_id).all()
+    if not partition_files(questionnaire_id):
+        return hot
+    return hot + load_archived_responses(questionnaire_id, exclude=(_identity(r) for r in hot))
+
+def user_responses(user_id):
+    """All responses by a user, hot and archived"""
+    from app.models.response import Response
+
+    hot = Response.query.filter_by(user_id=user_id).all()
+    seen = {_identity(r) for r in hot}
+    return hot + [r for r in find_archived_responses('user_id', user_id) if _identity(r) not in seen]
+
+def get_response(response_id):
+    """A response by id from the database, falling back to the archive"""
+    from app.models.response import Response
+
+    response = db.session.get(Response, response_id)
+    if response is not None:
+        return response
+    archived = find_archived_responses('id', response_id)
+    return archived[0] if archived else None
+
+def check_monotonic_response_ids():
+    """Warn on startup if the response table still needs ensure_monotonic_response_ids"""
+    if _legacy_response_table(db.session):
+        logger.warning('The response table can reuse ids of archived responses; '
+                       'run "flask --app run init-db" to migrate it')
+
+def ensure_monotonic_response_ids():
+    """Rebuild a legacy response table with AUTOINCREMENT and seed its sequence.
+
+    The sequence is raised above every archived id, so ids handed out before
+    this migration can't collide with new rows. Copies the whole table, so
+    it only runs from `flask init-db`.
+    """
+    from app.models.response import Response
+
+    with db.engine.begin() as connection:
+        if not _legacy_response_table(connection):
+            return
+
+        columns = ', '.join(column.name for column in Response.__table__.columns)
+        connection.execute(text("ALTER TABLE response RENAME TO response_legacy"))
+        Response.__table__.create(connection)
+        connection.execute(text(
+            "INSERT INTO response (%s) SELECT %s FROM response_legacy" % (columns, columns)
+        ))
+        connection.execute(text("DROP TABLE response_legacy"))
+
+        high_water = max(
+            connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM response")).scalar(),
+            _max_archived_id()
+        )
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'response'"))
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES ('response', :seq)"),
+            {'seq': high_water}
+        )
+
+def archivable_questionnaires(older_than_days=None):
+    """Map questionnaire id to the cutoff date of responses that may be archived.
+
+    Closed questionnaires (settings['closed']) are archived entirely; otherwise
+    only responses submitted more than older_than_days ago are moved.
+    """
+    from app.models.questionnaire import Questionnaire
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days) if older_than_days is not None else None
+    selection = {}
+    for questionnaire in Questionnaire.query.all():
+        if questionnaire.get_settings().get('closed'):
+            selection[questionnaire.id] = None
+        elif cutoff is not None:
+            selection[questionnaire.id] = cutoff
+    return selection
+
+def archive_questionnaire(questionnaire_id, cutoff=None, batch_size=10000):
+    """Move a questionnaire's responses (submitted before cutoff, or all) to a new partition.
+
+    Rows are streamed in id order, batch_size at a time, both when writing
+    the partition and when deleting them afterwards. Returns the number of
+    responses archived.
+    """
+    from app.models.questionnaire import Questionnaire
+    from app.models.response import Response
+    from app.search import unindex_responses
+
+    questionnaire = db.session.get(Questionnaire, questionnaire_id)
+    if questionnaire is None:
+        return 0
+    questions = questionnaire.get_questions()
+
+    query = Response.query.filter_by(questionnaire_id=questionnaire_id)
+    if cutoff is not None:
+        query = query.filter(Response.submitted_at < cutoff)
+    batches = _id_batches(query, batch_size)
+    batch = next(batches, None)
+    if batch is None:
+        return 0
+
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('questionnaire_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('answers', pa.string()),
+        ('started_at', pa.timestamp('us')),
+        ('submitted_at', pa.timestamp('us')),
+        ('completion_time', pa.float64()),
+    ])
+
+    path = partition_dir(questionnaire_id)
+    os.makedirs(path, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    tmp_filename = os.path.join(path, 'responses-%s.arrow.tmp' % stamp)
+
+    first_id = batch[0].id
+    count = 0
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with open(tmp_filename, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema, options=options) as writer:
+            while batch is not None:
+                writer.write_table(pa.Table.from_pydict(
+                    {col: [getattr(r, col) for r in batch] for col in ARCHIVE_COLUMNS},
+                    schema=schema
+                ))
+                count += len(batch)
+                last_id = batch[-1].id
+                batch = next(batches, None)
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(tmp_filename, os.path.join(path, 'responses-%s-%d-%d.arrow' % (stamp, first_id, last_id)))
+
+    # Rows are only removed once the partition is durably on disk. New
+    # responses get higher ids, so everything matching up to last_id is in
+    # the file. A crash part-way leaves rows in both places, which readers
+    # de-duplicate.
+    query = query.filter(Response.id <= last_id)
+    for batch in _id_batches(query, batch_size):
+        unindex_responses(batch, questions)
+        query.filter(Response.id.between(batch[0].id, batch[-1].id)).delete(synchronize_session=False)
+        db.session.commit()
+
+    return count
+
+def archive_responses(older_than_days=None):
+    """Archive responses of closed questionnaires and, optionally, old responses.
+
+    Returns {questionnaire_id: archived_count} for questionnaires that had rows moved.
+    """
+    archived = {}
+    for questionnaire_id, cutoff in archivable_questionnaires(older_than_days).items():
+        count = archive_questionnaire(questionnaire_id, cutoff)
+        if count:
+            archived[questionnaire_id] = count
+    return archived
+
+def remove_archive(questionnaire_id):
+    """Delete all archived partitions of a questionnaire"""
+    shutil.rmtree(partition_dir(questionnaire_id), ignore_errors=True)
+
+def _legacy_response_table(connection):
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    sql = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'response'"
+    )).scalar()
+    return sql is not None and 'AUTOINCREMENT' not in sql.upper()
+
+def _id_batches(query, batch_size):
+    """Yield the query's responses in id order, batch_size at a time"""
+    from app.models.response import Response
+
+    last_id = 0
+    while True:
+        batch = query.filter(Response.id > last_id).order_by(Response.id).limit(batch_size).all()
+        if not batch:
+            return
+        last_id = batch[-1].id  # Read before the consumer deletes and commits
+        yield batch
+
+def _id_range(path):
+    match = _PARTITION_RE.search(os.path.basename(path))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+def _identity(response):
+    # A crash between writing a partition and deleting its rows can leave the
+    # same response in both places; ids alone aren't enough to recognise that
+    # for archives written before ids became monotonic.
+    return (response.id, response.user_id, response.submitted_at)
+
+def _read_partitions(files, column=None, value=None, exclude=()):
+    from app.models.response import Response
+
+    if not files:
+        return []
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    exclude = set(exclude)
+    responses = []
+    for path in files:
+        if column is not None:
+            # Decompress only the filter column unless some row matches
+            options = pa.ipc.IpcReadOptions(included_fields=[ARCHIVE_COLUMNS.index(column)])
+            mask = pc.equal(pa.ipc.open_file(path, options=options).read_all()[column], value)
+            if not pc.any(mask).as_py():
+                continue
+            table = pa.ipc.open_file(path).read_all().filter(mask)
+        else:
+            table = pa.ipc.open_file(path).read_all()
+        for row in table.to_pylist():
+            response = Response(**row)
+            if _identity(response) not in exclude:
+                responses.append(response)
+    return responses
+
+def _max_archived_id():
+    files = all_partition_files()
+    if not files:
+        return 0
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    options = pa.ipc.IpcReadOptions(included_fields=[ARCHIVE_COLUMNS.index('id')])
+    return max(
+        _id_range(path)[1] if _id_range(path) else
+        pc.max(pa.ipc.open_file(path, options=options).read_all()['id']).as_py() or 0
+        for path in files
+    )
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import abort, current_app
+
+class QuestionnaireDefinition(namedtuple('QuestionnaireDefinition', (
+        'id', 'title', 'description', 'questions', 'settings',
+        'created_at', 'created_by', 'version'))):
+    """Decoded, read-only snapshot of a questionnaire.
+
+    Instances are shared between threads: never mutate questions or settings.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_model(cls, questionnaire, version):
+        return cls(
+            id=questionnaire.id,
+            title=questionnaire.title,
+            description=questionnaire.description,
+            questions=questionnaire.get_questions(),
+            settings=questionnaire.get_settings(),
+            created_at=questionnaire.created_at,
+            created_by=questionnaire.created_by,
+            version=version
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'questions': self.questions,
+            'settings': self.settings,
+            'created_at': self.created_at.isoformat(),
+            'created_by': self.created_by
+        }
+
+class QuestionnaireCache:
+    """Thread-safe LRU read-through cache of questionnaire definitions.
+
+    Every invalidation bumps the questionnaire's version, so a load that
+    started before a PUT/DELETE committed can never repopulate the cache with
+    the old definition. Invalidations are per process, so entries also expire
+    after ``ttl`` seconds to bound how long other workers serve an edited
+    definition. Writes must not trust a cached entry for existence: pass
+    ``verify=True`` to re-check it with a primary-key lookup.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # id -> (definition, expires_at)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, questionnaire_id, verify=False):
+        """Return the definition for questionnaire_id, or None if it doesn't exist"""
+        if self.maxsize <= 0:
+            return self._load(questionnaire_id, 0)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(questionnaire_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(questionnaire_id)
+                self.hits += 1
+                hit = entry[0]
+            else:
+                hit = None
+                self.misses += 1
+                version = self._versions.get(questionnaire_id, 0)
+
+        if hit is not None:
+            if verify and not self._exists(questionnaire_id):
+                # Deleted by another worker
+                self.invalidate(questionnaire_id)
+                return None
+            return hit
+
+        definition = self._load(questionnaire_id, version)
+        if definition is None:
+            return None
+
+        with self._lock:
+            if self._versions.get(questionnaire_id, 0) == version:
+                self._entries[questionnaire_id] = (definition, now + self.ttl)
+                self._entries.move_to_end(questionnaire_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return definition
+
+    def invalidate(self, questionnaire_id):
+        with self._lock:
+            self._entries.pop(questionnaire_id, None)
+            self._versions[questionnaire_id] = self._versions.get(questionnaire_id, 0) + 1
+
+    def _exists(self, questionnaire_id):
+        from app import db
+        from app.models.questionnaire import Questionnaire
+
+        return db.session.query(Questionnaire.id).filter_by(id=questionnaire_id).first() is not None
+
+    def _load(self, questionnaire_id, version):
+        from app import db
+        from app.models.questionnaire import Questionnaire
+
+        questionnaire = db.session.get(Questionnaire, questionnaire_id)
+        if questionnaire is None:
+            return None
+        return QuestionnaireDefinition.from_model(questionnaire, version)
+
+def init_questionnaire_cache(app):
+    app.extensions['questionnaire_cache'] = QuestionnaireCache(
+        maxsize=app.config.get('QUESTIONNAIRE_CACHE_SIZE', 1024),
+        ttl=app.config.get('QUESTIONNAIRE_CACHE_TTL', 30)
+    )
+
+def questionnaire_cache():
+    return current_app.extensions['questionnaire_cache']
+
+def get_definition_or_404(questionnaire_id, verify=False):
+    """Cached equivalent of Questionnaire.query.get_or_404 (verify=True for writes)"""
+    definition = questionnaire_cache().get(questionnaire_id, verify=verify)
+    if definition is None:
+        abort(404)
+    return definition
+
+def invalidate_definition(questionnaire_id):
+    questionnaire_cache().invalidate(questionnaire_id)
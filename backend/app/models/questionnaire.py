@@ -32,7 +32,8 @@ class Questionnaire(db.Model):
     
     def get_statistics(self):
         """Calculate basic statistics for the questionnaire"""
-        responses = self.responses.all()
+        from app.archive import all_responses
+        responses = all_responses(self.id)
         total_responses = len(responses)
         
         if total_responses == 0:
@@ -3,6 +3,9 @@ import json
 from app import db
 
 class Response(db.Model):
+    # Never reuse ids: archived responses keep theirs (see app/archive.py)
+    __table_args__ = {'sqlite_autoincrement': True}
+    
     id = db.Column(db.Integer, primary_key=True)
     questionnaire_id = db.Column(db.Integer, db.ForeignKey('questionnaire.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -39,7 +42,8 @@ class Response(db.Model):
     @staticmethod
     def get_analytics(questionnaire_id):
         """Get detailed analytics for a questionnaire's responses"""
-        responses = Response.query.filter_by(questionnaire_id=questionnaire_id).all()
+        from app.archive import all_responses
+        responses = all_responses(questionnaire_id)
         
         if not responses:
             return {
@@ -1,17 +1,21 @@
 from flask import Blueprint, jsonify, request
-import pandas as pd
-import numpy as np
-from app.models.questionnaire import Questionnaire
-from app.models.response import Response
+from flask_login import login_required, current_user
+from app.cache import get_definition_or_404
+from app.archive import all_responses
+from app.search import index_available, is_text_question, question_top_terms, search_answers
+
+# pandas/numpy are imported inside the functions that use them: they cost
+# hundreds of ms and tens of MB per process, and most workers only ever serve
+# submit traffic.
 
 bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
 @bp.route('/questionnaire/<int:questionnaire_id>/summary', methods=['GET'])
 def get_summary_statistics(questionnaire_id):
     """Get comprehensive summary statistics for a questionnaire"""
-    questionnaire = Questionnaire.query.get_or_404(questionnaire_id)
+    questionnaire = get_definition_or_404(questionnaire_id)
     
-    responses = Response.query.filter_by(questionnaire_id=questionnaire_id).all()
+    responses = all_responses(questionnaire_id)
     
     if not responses:
         return jsonify({
@@ -19,6 +23,8 @@ def get_summary_statistics(questionnaire_id):
             'data': None
         })
     
+    import pandas as pd
+    
     # Convert responses to pandas DataFrame for analysis
     response_data = []
     for response in responses:
@@ -51,10 +57,10 @@ def get_summary_statistics(questionnaire_id):
 @bp.route('/questionnaire/<int:questionnaire_id>/export', methods=['GET'])
 def export_analytics(questionnaire_id):
     """Export questionnaire data in various formats"""
-    questionnaire = Questionnaire.query.get_or_404(questionnaire_id)
+    questionnaire = get_definition_or_404(questionnaire_id)
     
     format_type = request.args.get('format', 'json')
-    responses = Response.query.filter_by(questionnaire_id=questionnaire_id).all()
+    responses = all_responses(questionnaire_id)
     
     if not responses:
         return jsonify({
@@ -80,11 +86,37 @@ def export_analytics(questionnaire_id):
     else:
         return jsonify({'error': 'Unsupported format'}), 400
 
+@bp.route('/questionnaire/<int:questionnaire_id>/search', methods=['GET'])
+@login_required
+def search_responses(questionnaire_id):
+    """Full-text search over free-text answers of a questionnaire"""
+    questionnaire = get_definition_or_404(questionnaire_id)
+    
+    # Only allow questionnaire creator to search its responses
+    if questionnaire.created_by != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if not index_available():
+        return jsonify({'error': 'Search is not supported by this database'}), 501
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+    
+    question_id = request.args.get('question_id', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    
+    results = search_answers(questionnaire_id, query, question_id=question_id, limit=limit)
+    results['query'] = query
+    return jsonify(results)
+
 def _calculate_response_rate(df):
     """Calculate response rate over time"""
     if 'submitted_at' not in df.columns or df.empty:
         return []
     
+    import pandas as pd
+    
     # Group by date and count responses
     df['date'] = pd.to_datetime(df['submitted_at']).dt.date
     daily_responses = df.groupby('date').size().reset_index()
@@ -94,31 +126,47 @@ def _calculate_response_rate(df):
 
 def _analyze_questions(questionnaire, df):
     """Analyze individual questions"""
-    questions = questionnaire.get_questions()
+    questions = questionnaire.questions
     analysis = {}
     
     for idx, question in enumerate(questions):
         q_id = str(idx)
-        if q_id in df.columns:
-            responses = df[q_id].value_counts()
-            
+        if q_id not in df.columns:
+            continue
+        
+        # Free-text answers are nearly all unique, so a value distribution is
+        # meaningless; summarise them from the search index instead.
+        if is_text_question(question):
             analysis[q_id] = {
                 'question_text': question['text'],
                 'type': question['type'],
-                'response_distribution': responses.to_dict(),
-                'response_count': len(responses),
-                'unique_answers': len(responses.unique())
+                'response_count': int(df[q_id].count()),
+                'top_terms': question_top_terms(questionnaire.id, idx)
             }
-            
-            # Additional analysis for multiple choice questions
-            if question['type'] == 'multiple_choice':
-                analysis[q_id]['most_common'] = responses.index[0] if not responses.empty else None
-                analysis[q_id]['least_common'] = responses.index[-1] if not responses.empty else None
+            continue
+        
+        responses = df[q_id].value_counts()
+        
+        analysis[q_id] = {
+            'question_text': question['text'],
+            'type': question['type'],
+            'response_distribution': responses.to_dict(),
+            'response_count': len(responses),
+            'unique_answers': len(responses.unique())
+        }
+        
+        # Additional analysis for multiple choice questions
+        if question['type'] == 'multiple_choice':
+            analysis[q_id]['most_common'] = responses.index[0] if not responses.empty else None
+            analysis[q_id]['least_common'] = responses.index[-1] if not responses.empty else None
     
     return analysis
 
 def _analyze_correlations(df):
     """Analyze correlations between questions"""
+    import numpy as np
+    import pandas as pd
+    
     # Remove non-numeric columns
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     
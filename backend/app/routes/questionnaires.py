@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models.questionnaire import Questionnaire
+from app.archive import remove_archive
+from app.cache import get_definition_or_404, invalidate_definition
+from app.search import indexed_questions, reindex_questionnaire_async, remove_questionnaire
 
 bp = Blueprint('questionnaires', __name__, url_prefix='/api/questionnaires')
 
@@ -47,8 +50,8 @@ def create_questionnaire():
 @login_required
 def get_questionnaire(id):
     """Get a specific questionnaire"""
-    questionnaire = Questionnaire.query.get_or_404(id)
-    return jsonify(questionnaire.to_dict())
+    definition = get_definition_or_404(id)
+    return jsonify(definition.to_dict())
 
 @bp.route('/<int:id>', methods=['PUT'])
 @login_required
@@ -60,6 +63,7 @@ def update_questionnaire(id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
+    indexed = indexed_questions(questionnaire.get_questions())
     
     if 'title' in data:
         questionnaire.title = data['title']
@@ -71,6 +75,12 @@ def update_questionnaire(id):
         questionnaire.set_settings(data['settings'])
     
     db.session.commit()
+    invalidate_definition(id)
+    
+    # Re-reading every answer can take a while; only do it when the set of
+    # indexed questions changed, and outside the request
+    if indexed_questions(questionnaire.get_questions()) != indexed:
+        reindex_questionnaire_async(id)
     
     return jsonify(questionnaire.to_dict())
 
@@ -83,8 +93,11 @@ def delete_questionnaire(id):
     if questionnaire.created_by != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    remove_questionnaire(questionnaire.id)
     db.session.delete(questionnaire)
     db.session.commit()
+    invalidate_definition(id)
+    remove_archive(id)
     
     return jsonify({'message': 'Questionnaire deleted successfully'})
 
@@ -1,9 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
 from app import db
-from app.models.questionnaire import Questionnaire
+from app import archive
+from app.cache import get_definition_or_404
 from app.models.response import Response
+from app.search import index_response
+from app.write_behind import write_behind_log
 
 bp = Blueprint('responses', __name__, url_prefix='/api/responses')
 
@@ -11,11 +14,13 @@ bp = Blueprint('responses', __name__, url_prefix='/api/responses')
 @login_required
 def submit_response(questionnaire_id):
     """Submit a response to a questionnaire"""
-    questionnaire = Questionnaire.query.get_or_404(questionnaire_id)
+    questionnaire = get_definition_or_404(questionnaire_id, verify=True)
     data = request.get_json()
     
     if not data or 'answers' not in data:
         return jsonify({'error': 'Missing answers'}), 400
+    if not isinstance(data['answers'], dict):
+        return jsonify({'error': 'Answers must be an object keyed by question index'}), 400
     
     # Create new response
     response = Response(
@@ -26,7 +31,16 @@ def submit_response(questionnaire_id):
     response.set_answers(data['answers'])
     response.submit()  # Sets submitted_at and calculates completion_time
     
+    # In write-behind mode the response is durable once logged; it gets its
+    # id (and becomes visible to reads) when the flusher inserts it.
+    log = write_behind_log()
+    if log is not None:
+        log.append(response)
+        return jsonify(response.to_dict()), 202
+    
     db.session.add(response)
+    db.session.flush()  # Assign response.id before indexing
+    index_response(response, questionnaire.questions)
     db.session.commit()
     
     return jsonify(response.to_dict()), 201
@@ -35,23 +49,26 @@ def submit_response(questionnaire_id):
 @login_required
 def get_questionnaire_responses(questionnaire_id):
     """Get all responses for a questionnaire"""
-    questionnaire = Questionnaire.query.get_or_404(questionnaire_id)
+    questionnaire = get_definition_or_404(questionnaire_id)
     
     # Only allow questionnaire creator to view all responses
     if questionnaire.created_by != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    responses = Response.query.filter_by(questionnaire_id=questionnaire_id).all()
+    responses = archive.all_responses(questionnaire_id)
     return jsonify([r.to_dict() for r in responses])
 
 @bp.route('/<int:response_id>', methods=['GET'])
 @login_required
 def get_response(response_id):
     """Get a specific response"""
-    response = Response.query.get_or_404(response_id)
+    response = archive.get_response(response_id)
+    if response is None:
+        abort(404)
     
     # Allow access only to response owner or questionnaire creator
-    if response.user_id != current_user.id and response.questionnaire.created_by != current_user.id:
+    questionnaire = get_definition_or_404(response.questionnaire_id)
+    if response.user_id != current_user.id and questionnaire.created_by != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
     return jsonify(response.to_dict())
@@ -60,7 +77,7 @@ def get_response(response_id):
 @login_required
 def get_response_analytics(questionnaire_id):
     """Get analytics for questionnaire responses"""
-    questionnaire = Questionnaire.query.get_or_404(questionnaire_id)
+    questionnaire = get_definition_or_404(questionnaire_id)
     
     # Only allow questionnaire creator to view analytics
     if questionnaire.created_by != current_user.id:
@@ -77,5 +94,5 @@ def get_user_responses(user_id):
     if user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    responses = Response.query.filter_by(user_id=user_id).all()
+    responses = archive.user_responses(user_id)
     return jsonify([r.to_dict() for r in responses])
@@ -0,0 +1,361 @@
+import logging
+import re
+import threading
+from collections import Counter
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Question types whose answers are open-ended text. Only these are indexed;
+# choice, rating and scale questions keep their value distribution.
+TEXT_QUESTION_TYPES = ('text', 'textarea', 'open_ended')
+
+# Same word boundaries as the unicode61 tokenizer (underscore separates words)
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Snippets and term frequencies are computed over at most this many of the
+# best-ranked matching answers, so broad queries stay cheap.
+TOP_MATCHES = 1000
+
+# Term counts (answer_term and search top_terms) leave out function words and
+# very short tokens; they are still indexed and searchable.
+MIN_TERM_LENGTH = 3
+STOPWORDS = frozenset('''
+    a about above after again against all am an and any are as at be because
+    been before being below between both but by can did do does doing down
+    during each few for from further had has have having he her here hers
+    herself him himself his how i if in into is it its itself just me more
+    most my myself no nor not now of off on once only or other our ours
+    ourselves out over own same she should so some such than that the their
+    theirs them themselves then there these they this those through to too
+    under until up very was we were what when where which while who whom why
+    will with would you your yours yourself yourselves
+'''.split())
+
+# Bump whenever the indexing rules change; `flask init-db` rebuilds an index
+# built with an older version.
+INDEX_VERSION = 2
+
+# questionnaire_id and question_id are indexed columns so that scoping a search
+# to a questionnaire is a posting-list lookup (column filter in MATCH) rather
+# than a scan of every indexed answer.
+_CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS answer_fts USING fts5(
+    answer,
+    questionnaire_id,
+    question_id,
+    response_id UNINDEXED,
+    tokenize = 'unicode61'
+)
+"""
+
+# Per-question term counts, maintained alongside the index so summaries don't
+# have to re-read and tokenize every answer.
+_CREATE_TERM_COUNTS = """
+CREATE TABLE IF NOT EXISTS answer_term (
+    questionnaire_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    term VARCHAR(200) NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (questionnaire_id, question_id, term)
+)
+"""
+
+_CREATE_VERSION = """
+CREATE TABLE IF NOT EXISTS answer_index_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+)
+"""
+
+def index_available():
+    """Full-text search is only available on SQLite (FTS5)"""
+    return db.engine.dialect.name == 'sqlite'
+
+def init_answer_index():
+    """Create the answer index tables if missing (caller commits).
+
+    Runs on every startup, so it never backfills: existing responses are
+    indexed by backfill_answer_index (`flask init-db`), which a worker
+    holding the write lock for minutes would otherwise do on boot.
+    """
+    if not index_available():
+        return
+
+    db.session.execute(text(_CREATE_INDEX))
+    db.session.execute(text(_CREATE_TERM_COUNTS))
+    db.session.execute(text(_CREATE_VERSION))
+    if _index_version() == INDEX_VERSION:
+        return
+    if db.session.execute(text("SELECT 1 FROM response LIMIT 1")).first() is None:
+        _set_index_version()  # Nothing to backfill
+    else:
+        logger.warning('Answer search index is missing or outdated; '
+                       'run "flask --app run init-db" to rebuild it')
+
+def backfill_answer_index():
+    """Rebuild the answer index unless it is up to date (caller commits)"""
+    if index_available() and _index_version() != INDEX_VERSION:
+        rebuild_answer_index()
+
+def rebuild_answer_index():
+    """Re-index all stored responses (caller commits)"""
+    from app.models.questionnaire import Questionnaire
+
+    db.session.execute(text("DELETE FROM answer_fts"))
+    db.session.execute(text("DELETE FROM answer_term"))
+    for questionnaire in Questionnaire.query.all():
+        _index_questionnaire(questionnaire)
+    _set_index_version()
+
+def reindex_questionnaire(questionnaire_id, batch_size=1000):
+    """Re-index one questionnaire after its questions changed, committing per batch.
+
+    Responses committed after the old entries are dropped get a higher id
+    and are indexed by their own submit, so only ids up to that point are
+    re-read here.
+    """
+    from app.models.questionnaire import Questionnaire
+    from app.models.response import Response
+
+    if not index_available():
+        return
+    questionnaire = db.session.get(Questionnaire, questionnaire_id)
+    if questionnaire is None:
+        return
+    questions = questionnaire.get_questions()
+
+    # The delete takes the write lock, so no submit can commit between it
+    # and reading the high-water mark
+    remove_questionnaire(questionnaire_id)
+    high_water = db.session.query(db.func.max(Response.id)).scalar() or 0
+    db.session.commit()
+
+    last_id = 0
+    while True:
+        batch = Response.query.filter(
+            Response.questionnaire_id == questionnaire_id,
+            Response.id > last_id,
+            Response.id <= high_water
+        ).order_by(Response.id).limit(batch_size).all()
+        if not batch:
+            break
+        _insert_rows(row for response in batch for row in _text_answers(questions, response))
+        db.session.commit()
+        last_id = batch[-1].id
+
+def reindex_questionnaire_async(questionnaire_id):
+    """Run reindex_questionnaire in a background thread and return the thread"""
+    thread = threading.Thread(
+        target=_reindex_in_background,
+        args=(current_app._get_current_object(), questionnaire_id),
+        name='reindex-questionnaire-%d' % questionnaire_id,
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+def index_response(response, questions):
+    """Add a response's free-text answers to the index (caller commits)"""
+    if not index_available():
+        return
+    _insert_rows(_text_answers(questions, response))
+
+def remove_questionnaire(questionnaire_id):
+    """Drop all indexed answers for a questionnaire (caller commits)"""
+    if not index_available():
+        return
+    db.session.execute(
+        text("DELETE FROM answer_fts WHERE rowid IN "
+             "(SELECT rowid FROM answer_fts WHERE answer_fts MATCH :match)"),
+        {'match': _scope(questionnaire_id)}
+    )
+    db.session.execute(
+        text("DELETE FROM answer_term WHERE questionnaire_id = :qid"),
+        {'qid': questionnaire_id}
+    )
+
+def unindex_responses(responses, questions):
+    """Drop the given responses of one questionnaire from the index (caller commits)"""
+    if not index_available() or not responses:
+        return
+
+    questionnaire_id = responses[0].questionnaire_id
+    ids = [r.id for r in responses]
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        params = {'match': _scope(questionnaire_id)}
+        params.update(('id%d' % i, response_id) for i, response_id in enumerate(chunk))
+        placeholders = ', '.join(':id%d' % i for i in range(len(chunk)))
+        db.session.execute(text(
+            "DELETE FROM answer_fts WHERE rowid IN (SELECT rowid FROM answer_fts "
+            "WHERE answer_fts MATCH :match AND response_id IN (%s))" % placeholders
+        ), params)
+
+    counts = _term_counts(row for r in responses for row in _text_answers(questions, r))
+    if counts:
+        db.session.execute(text(
+            "UPDATE answer_term SET count = count - :count "
+            "WHERE questionnaire_id = :qid AND question_id = :question_id AND term = :term"
+        ), counts)
+        db.session.execute(
+            text("DELETE FROM answer_term WHERE questionnaire_id = :qid AND count <= 0"),
+            {'qid': questionnaire_id}
+        )
+
+def search_answers(questionnaire_id, query, question_id=None, limit=50, top_terms=20):
+    """Return ranked responses matching query and the most frequent terms among the best matches"""
+    terms_expr = _match_expression(query)
+    if not terms_expr:
+        return {'total_matches': 0, 'results': [], 'top_terms': []}
+
+    match = '%s AND answer : (%s)' % (_scope(questionnaire_id, question_id), terms_expr)
+    # Count matching answers rather than distinct responses: reading the
+    # unindexed response_id column for every match would double the cost.
+    total = db.session.execute(
+        text("SELECT COUNT(*) FROM answer_fts WHERE answer_fts MATCH :match"),
+        {'match': match}
+    ).scalar()
+    rows = db.session.execute(text("""
+        SELECT response_id, question_id, answer,
+               snippet(answer_fts, 0, '[', ']', '...', 12) AS snippet,
+               bm25(answer_fts, 1.0, 0.0, 0.0) AS score
+        FROM answer_fts
+        WHERE answer_fts MATCH :match
+        ORDER BY score
+        LIMIT :top
+    """), {'match': match, 'top': TOP_MATCHES}).all()
+
+    # Collapse multiple matching answers of the same response into one hit,
+    # keeping the best (lowest bm25) score first.
+    results = {}
+    terms = Counter()
+    for row in rows:
+        terms.update(summary_terms(row.answer))
+        hit = results.get(row.response_id)
+        if hit is None:
+            hit = results[row.response_id] = {
+                'response_id': int(row.response_id),
+                'score': -row.score,
+                'matches': []
+            }
+        hit['matches'].append({
+            'question_id': row.question_id,
+            'snippet': row.snippet
+        })
+
+    ranked = list(results.values())
+    return {
+        'total_matches': total,
+        'results': ranked[:limit],
+        'top_terms': [{'term': t, 'count': c} for t, c in terms.most_common(top_terms)]
+    }
+
+def question_top_terms(questionnaire_id, question_id, limit=10):
+    """Most frequent terms across all indexed answers to a question"""
+    if not index_available():
+        return []
+
+    rows = db.session.execute(text(
+        "SELECT term, count FROM answer_term "
+        "WHERE questionnaire_id = :qid AND question_id = :question_id "
+        "ORDER BY count DESC, term LIMIT :limit"
+    ), {'qid': questionnaire_id, 'question_id': int(question_id), 'limit': limit})
+    return [{'term': row.term, 'count': row.count} for row in rows]
+
+def is_text_question(question):
+    return question.get('type') in TEXT_QUESTION_TYPES
+
+def indexed_questions(questions):
+    """Indices of the questions whose answers are indexed"""
+    return tuple(idx for idx, question in enumerate(questions) if is_text_question(question))
+
+def tokenize(value):
+    return [t.lower() for t in _TOKEN_RE.findall(value)]
+
+def summary_terms(value):
+    """Tokens worth counting in term summaries"""
+    return [t for t in tokenize(value) if len(t) >= MIN_TERM_LENGTH and t not in STOPWORDS]
+
+def _index_version():
+    return db.session.execute(text("SELECT version FROM answer_index_version")).scalar()
+
+def _set_index_version():
+    db.session.execute(
+        text("INSERT OR REPLACE INTO answer_index_version (id, version) VALUES (1, :version)"),
+        {'version': INDEX_VERSION}
+    )
+
+def _reindex_in_background(app, questionnaire_id):
+    with app.app_context():
+        try:
+            reindex_questionnaire(questionnaire_id)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Re-indexing questionnaire %s failed', questionnaire_id)
+
+def _index_questionnaire(questionnaire):
+    from app.models.response import Response
+
+    questions = questionnaire.get_questions()
+    query = Response.query.filter_by(questionnaire_id=questionnaire.id)
+    rows = []
+    for response in query.yield_per(1000):
+        rows.extend(_text_answers(questions, response))
+        if len(rows) >= 5000:
+            _insert_rows(rows)
+            rows = []
+    _insert_rows(rows)
+
+def _text_answers(questions, response):
+    answers = response.get_answers()
+    if not isinstance(answers, dict):
+        return  # Stored before submits were validated
+    for idx, question in enumerate(questions):
+        answer = answers.get(str(idx))
+        if is_text_question(question) and isinstance(answer, str) and answer.strip():
+            yield {
+                'answer': answer,
+                'qid': response.questionnaire_id,
+                'question_id': str(idx),
+                'response_id': response.id
+            }
+
+def _insert_rows(rows):
+    rows = list(rows)
+    if not rows:
+        return
+    db.session.execute(
+        text("INSERT INTO answer_fts (answer, questionnaire_id, question_id, response_id) "
+             "VALUES (:answer, :qid, :question_id, :response_id)"),
+        rows
+    )
+    counts = _term_counts(rows)
+    if counts:
+        db.session.execute(text(
+            "INSERT INTO answer_term (questionnaire_id, question_id, term, count) "
+            "VALUES (:qid, :question_id, :term, :count) "
+            "ON CONFLICT (questionnaire_id, question_id, term) DO UPDATE SET count = count + excluded.count"
+        ), counts)
+
+def _term_counts(rows):
+    counts = Counter()
+    for row in rows:
+        for term in summary_terms(row['answer']):
+            counts[(row['qid'], int(row['question_id']), term)] += 1
+    return [
+        {'qid': qid, 'question_id': question_id, 'term': term, 'count': count}
+        for (qid, question_id, term), count in counts.items()
+    ]
+
+def _match_expression(query):
+    """Turn user input into an FTS5 query of quoted terms (implicit AND)"""
+    return ' '.join('"%s"' % t for t in tokenize(query or ''))
+
+def _scope(questionnaire_id, question_id=None):
+    scope = 'questionnaire_id : "%d"' % int(questionnaire_id)
+    if question_id is not None:
+        scope += ' AND question_id : "%d"' % int(question_id)
+    return scope
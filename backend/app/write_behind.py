@@ -0,0 +1,377 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+
+# Write-behind submission: validated responses are appended to a local log and
+# acknowledged once the log is fsynced; a background thread moves them into the
+# database in group commits.
+#
+# Layout: <WRITE_BEHIND_LOG_DIR>/worker-<pid>-<ts>/<seq>.log, one directory per
+# process (held with flock while the process lives) holding JSON-lines
+# segments. The active segment is rotated on every flush; closed segments are
+# inserted in a single transaction that also records the segment name in
+# write_behind_segment, so replaying a segment after a crash is idempotent.
+# Directories whose lock is free belong to dead processes; the first serving
+# process to claim one keeps its lock until every segment is replayed and the
+# directory is gone, so each orphan is replayed by exactly one process.
+#
+# A segment that fails to insert for any reason other than the database being
+# unavailable is moved to <WRITE_BEHIND_LOG_DIR>/failed/ and logged, so one bad
+# segment never holds up the ones behind it. Malformed records are skipped.
+#
+# The flusher (and recovery) only starts on the first request, so CLI commands
+# and scripts that call create_app() never touch the log.
+
+logger = logging.getLogger(__name__)
+
+_CREATE_MARKERS = """
+CREATE TABLE IF NOT EXISTS write_behind_segment (
+    name VARCHAR(200) PRIMARY KEY,
+    flushed_at DATETIME NOT NULL
+)
+"""
+
+def init_write_behind_schema():
+    """Create the table recording flushed segments (caller commits)"""
+    db.session.execute(text(_CREATE_MARKERS))
+
+class WriteBehindLog:
+    """Durable append-only response log with group fsync"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'worker-%d-%d' % (os.getpid(), time.time_ns()))
+        # Take the lock before the directory becomes visible under its final
+        # name, so recovery in another process can't mistake it for an orphan.
+        pending = self.path + '.init'
+        os.makedirs(pending)
+        self._lock_file = open(os.path.join(pending, 'LOCK'), 'w')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(pending, self.path)
+
+        self._append_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._segment_seq = 0
+        self._written = 0
+        self._synced = 0
+        self._segment_has_data = False
+        self._segment = self._open_segment()
+
+    def append(self, response):
+        """Append a response and return once it is on stable storage"""
+        line = json.dumps({
+            'questionnaire_id': response.questionnaire_id,
+            'user_id': response.user_id,
+            'answers': response.answers,
+            'started_at': _isoformat(response.started_at),
+            'submitted_at': _isoformat(response.submitted_at),
+            'completion_time': response.completion_time
+        }) + '\n'
+
+        with self._append_lock:
+            self._segment.write(line)
+            self._segment_has_data = True
+            self._written += 1
+            seq = self._written
+
+        self._sync(seq)
+
+    def rotate(self):
+        """Close the active segment and return its path (None if it is empty)"""
+        with self._sync_lock, self._append_lock:
+            if not self._segment_has_data:
+                return None
+            old = self._segment
+            old.flush()
+            os.fsync(old.fileno())
+            old.close()
+            self._synced = self._written
+            self._segment = self._open_segment()
+            self._segment_has_data = False
+            return old.name
+
+    def closed_segments(self, path=None):
+        path = path or self.path
+        active = self._segment.name
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith('.log') and os.path.join(path, name) != active
+        )
+
+    def claim_orphans(self):
+        """Yield log directories of processes that exited without flushing.
+
+        The directory's lock is held until the consumer moves on to the next
+        one, so no other process can replay it at the same time.
+        """
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            lock_path = os.path.join(path, 'LOCK')
+            if path == self.path or name == 'failed' or name.endswith('.init') or not os.path.isdir(path):
+                continue
+            try:
+                lock_file = open(lock_path, 'r')
+            except FileNotFoundError:
+                continue  # Removed by another process's recovery
+            try:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Owned by a live process or being recovered
+                # The previous holder may have finished and removed the
+                # directory between our open() and flock()
+                try:
+                    if os.stat(lock_path).st_ino != os.fstat(lock_file.fileno()).st_ino:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield path
+            finally:
+                lock_file.close()  # Releases the lock
+
+    def close(self):
+        with self._sync_lock, self._append_lock:
+            self._segment.close()
+            if not self._segment_has_data:
+                os.remove(self._segment.name)
+            if not any(name.endswith('.log') for name in os.listdir(self.path)):
+                shutil.rmtree(self.path, ignore_errors=True)
+        self._lock_file.close()
+
+    def _sync(self, seq):
+        # Group commit: whichever thread gets the sync lock first fsyncs every
+        # record written so far; the threads queued behind it find their
+        # record already synced and return without another fsync.
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._append_lock:
+                target = self._written
+                self._segment.flush()
+                fileno = self._segment.fileno()
+            os.fsync(fileno)
+            self._synced = target
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        name = os.path.join(self.path, '%020d-%06d.log' % (time.time_ns(), self._segment_seq))
+        return open(name, 'a', encoding='utf-8')
+
+class WriteBehindFlusher:
+    """Background thread moving logged responses into the database"""
+
+    def __init__(self, app, root, interval):
+        self.app = app
+        self.root = root
+        self.interval = interval
+        self.log = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+
+    def ensure_started(self):
+        """Open this process's log, replay orphans and start the thread (once)"""
+        if self.log is not None:
+            return
+        with self._start_lock:
+            if self.log is not None:
+                return
+            log = WriteBehindLog(self.root)
+            self.log = log
+            self.recover()
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Stop the thread, flush what is left and release the log (idempotent)"""
+        if self.log is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            # Whatever is left stays in the log and is replayed by the next process
+            logger.exception('Final write-behind flush failed')
+        self.log.close()
+
+    def recover(self):
+        """Replay segments left behind by processes that exited without flushing.
+
+        Errors are logged rather than raised: the directory stays on disk and
+        is retried by the next process that starts.
+        """
+        try:
+            with self.app.app_context():
+                for path in self.log.claim_orphans():
+                    try:
+                        self._recover_directory(path)
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception('Write-behind recovery of %s failed', path)
+        except Exception:
+            logger.exception('Write-behind recovery failed')
+
+    def _recover_directory(self, path):
+        # Called with the directory's lock held, so nobody else can be reading
+        # these segments; markers are dropped only once the directory is gone.
+        for segment in self.log.closed_segments(path):
+            if not self._flush_or_quarantine(segment, forget_marker=False):
+                return  # Database unavailable; the next process retries
+        shutil.rmtree(path, ignore_errors=True)
+        db.session.execute(
+            text("DELETE FROM write_behind_segment WHERE name LIKE :prefix"),
+            {'prefix': os.path.basename(path) + '/%'}
+        )
+        db.session.commit()
+
+    def flush(self):
+        self.log.rotate()
+        with self.app.app_context():
+            for segment in self.log.closed_segments():
+                if not self._flush_or_quarantine(segment):
+                    break
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # Segments stay on disk and are retried on the next tick
+                logger.exception('Write-behind flush failed')
+
+    def _flush_or_quarantine(self, path, forget_marker=True):
+        """Flush a segment, quarantining it if it can't be inserted.
+
+        Returns False if the database is unavailable (locked, gone), in which
+        case the segment stays in place and should be retried later.
+        """
+        try:
+            self._flush_segment(path, forget_marker)
+        except OperationalError:
+            db.session.rollback()
+            logger.exception('Write-behind flush of %s failed, will retry', path)
+            return False
+        except Exception:
+            db.session.rollback()
+            failed = os.path.join(self.root, 'failed')
+            os.makedirs(failed, exist_ok=True)
+            target = os.path.join(failed, os.path.basename(os.path.dirname(path)) + '-' + os.path.basename(path))
+            os.replace(path, target)
+            logger.exception('Write-behind segment %s could not be inserted, moved to %s', path, target)
+        return True
+
+    def _flush_segment(self, path, forget_marker=True):
+        from app.cache import questionnaire_cache
+        from app.search import index_response
+
+        name = os.path.basename(os.path.dirname(path)) + '/' + os.path.basename(path)
+        already_flushed = db.session.execute(
+            text("SELECT 1 FROM write_behind_segment WHERE name = :name"), {'name': name}
+        ).first()
+
+        if not already_flushed:
+            try:
+                records = list(_read_records(path))
+            except FileNotFoundError:
+                return
+            responses = []
+            definitions = {}  # One existence check per questionnaire, not per record
+            for record in records:
+                try:
+                    response = _to_response(record)
+                except (KeyError, TypeError, ValueError):
+                    logger.warning('Skipping malformed record in %s: %r', path, record)
+                    continue
+                questionnaire_id = response.questionnaire_id
+                if questionnaire_id not in definitions:
+                    definitions[questionnaire_id] = questionnaire_cache().get(questionnaire_id, verify=True)
+                definition = definitions[questionnaire_id]
+                if definition is None:
+                    logger.warning('Dropping logged response for deleted questionnaire %s', questionnaire_id)
+                    continue
+                responses.append((response, definition.questions))
+
+            db.session.add_all(r for r, _ in responses)
+            db.session.flush()
+            for response, questions in responses:
+                index_response(response, questions)
+            db.session.execute(
+                text("INSERT INTO write_behind_segment (name, flushed_at) VALUES (:name, :now)"),
+                {'name': name, 'now': datetime.utcnow()}
+            )
+            db.session.commit()
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        if forget_marker:
+            # Only this process (holding the directory lock) reads its segments
+            db.session.execute(text("DELETE FROM write_behind_segment WHERE name = :name"), {'name': name})
+            db.session.commit()
+
+def init_write_behind(app):
+    """Enable write-behind submission if WRITE_BEHIND_ENABLED is set.
+
+    Nothing is opened here: the flusher starts with the first request, so
+    only serving processes own a log and replay orphans.
+    """
+    if not app.config.get('WRITE_BEHIND_ENABLED'):
+        return
+
+    root = app.config.get('WRITE_BEHIND_LOG_DIR') or os.path.join(app.instance_path, 'write_behind')
+    flusher = WriteBehindFlusher(app, root, app.config.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.05))
+    app.extensions['write_behind'] = flusher
+    app.before_request(flusher.ensure_started)
+
+def write_behind_log():
+    """The current app's write-behind log, or None when submits go straight to the database"""
+    flusher = current_app.extensions.get('write_behind')
+    if flusher is None:
+        return None
+    flusher.ensure_started()
+    return flusher.log
+
+def _read_records(path):
+    with open(path, encoding='utf-8') as segment:
+        for line in segment:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Torn tail from a crash mid-append; it was never acknowledged
+                logger.warning('Skipping corrupt record in %s', path)
+
+def _to_response(record):
+    """Build a Response from a log record, raising KeyError/TypeError/ValueError if malformed"""
+    from app.models.response import Response
+
+    if not isinstance(json.loads(record['answers']), dict):
+        raise ValueError('answers is not an object')
+    if not isinstance(record['questionnaire_id'], int) or not isinstance(record['user_id'], int):
+        raise TypeError('questionnaire_id and user_id must be integers')
+    return Response(
+        questionnaire_id=record['questionnaire_id'],
+        user_id=record['user_id'],
+        answers=record['answers'],
+        started_at=_parse_datetime(record['started_at']),
+        submitted_at=_parse_datetime(record['submitted_at']),
+        completion_time=record['completion_time']
+    )
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
@@ -0,0 +1,71 @@
+"""Move responses of closed questionnaires (and optionally old responses) out of
+the database into compressed Arrow partitions, and report the effect.
+
+Usage: python archive_responses.py [--older-than DAYS] [--no-vacuum]
+"""
+import argparse
+import os
+import time
+from sqlalchemy import text
+from app import create_app, db
+from app.archive import archive_dir, archive_responses
+
+def _db_size():
+    path = db.engine.url.database
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+def _archive_size():
+    total = 0
+    for root, _, files in os.walk(archive_dir()):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def _scan_time(repeat=3):
+    """Best-of-N time for a full scan of the hot response table"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.session.execute(text("SELECT COUNT(*), SUM(LENGTH(answers)) FROM response")).first()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _mb(size):
+    return size / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--older-than', type=int, metavar='DAYS',
+                        help='also archive responses submitted more than DAYS days ago')
+    parser.add_argument('--no-vacuum', action='store_true',
+                        help='skip VACUUM (the database file will not shrink)')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        size_before = _db_size()
+        scan_before = _scan_time()
+
+        archived = archive_responses(older_than_days=args.older_than)
+
+        if archived and not args.no_vacuum:
+            db.session.remove()
+            with db.engine.connect() as connection:
+                connection.execute(text("VACUUM"))
+
+        size_after = _db_size()
+        scan_after = _scan_time()
+
+        if not archived:
+            print("Nothing to archive.")
+            return
+
+        for questionnaire_id, count in sorted(archived.items()):
+            print(f"Questionnaire {questionnaire_id}: archived {count} responses")
+        print(f"Archive directory: {archive_dir()} ({_mb(_archive_size()):.1f} MB)")
+        print(f"Database size:     {_mb(size_before):.1f} MB -> {_mb(size_after):.1f} MB")
+        print(f"Hot table scan:    {scan_before * 1000:.1f} ms -> {scan_after * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
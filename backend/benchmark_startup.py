@@ -0,0 +1,99 @@
+"""Benchmark worker startup: time to a ready app and peak RSS per process.
+
+Each scenario runs in a fresh interpreter, as a new worker would:
+  eager        - pandas/numpy imported up front and schema check on (old behaviour)
+  lazy         - analytics stack imported on first use, schema check on
+  lazy+skip    - lazy imports and SCHEMA_CHECK_ON_STARTUP=0
+  first query  - lazy+skip, then one analytics summary request (pays the import)
+
+Usage: python benchmark_startup.py [runs]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+if os.environ['SCENARIO'] == 'eager':
+    import numpy, pandas
+from app import create_app, db
+from config import Config
+
+class BenchmarkConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.environ['BENCH_DB']
+    SCHEMA_CHECK_ON_STARTUP = os.environ['SCENARIO'] in ('eager', 'lazy')
+    DEBUG = False
+
+app = create_app(BenchmarkConfig)
+if os.environ['SCENARIO'] == 'first query':
+    app.test_client().get('/api/analytics/questionnaire/1/summary')
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss_kb / 1024,
+                  'pandas_loaded': 'pandas' in sys.modules}))
+'''
+
+SCENARIOS = ('eager', 'lazy', 'lazy+skip', 'first query')
+
+def _seed_database(db_path):
+    """Create the schema and one questionnaire with a response so every scenario hits the same DB"""
+    code = r'''
+import os
+from app import create_app, db
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from app.models.response import Response
+from config import Config
+
+class BenchmarkConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.environ['BENCH_DB']
+
+app = create_app(BenchmarkConfig)
+with app.app_context():
+    user = User(username='bench_user', email='bench@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    questionnaire = Questionnaire(title='Startup', created_by=user.id)
+    questionnaire.set_questions([{'id': 0, 'text': 'Q', 'type': 'multiple_choice', 'options': ['A', 'B']}])
+    db.session.add(questionnaire)
+    db.session.commit()
+    response = Response(questionnaire_id=questionnaire.id, user_id=user.id)
+    response.set_answers({'0': 'A'})
+    response.submit()
+    db.session.add(response)
+    db.session.commit()
+'''
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env=dict(os.environ, BENCH_DB=db_path))
+
+def run_scenario(scenario, db_path):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD],
+        check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, SCENARIO=scenario, BENCH_DB=db_path)
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, 'benchmark.db')
+    _seed_database(db_path)
+
+    print(f"{'scenario':12s} {'startup (ms)':>12s} {'peak RSS (MB)':>14s}  pandas loaded")
+    for scenario in SCENARIOS:
+        results = [run_scenario(scenario, db_path) for _ in range(runs)]
+        seconds = sorted(r['seconds'] for r in results)[len(results) // 2]
+        rss = sorted(r['rss_mb'] for r in results)[len(results) // 2]
+        print(f"{scenario:12s} {seconds * 1000:12.1f} {rss:14.1f}  {results[0]['pandas_loaded']}")
+
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
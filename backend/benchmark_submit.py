@@ -0,0 +1,82 @@
+"""Benchmark response submission throughput with the questionnaire cache on and off.
+
+Usage: python benchmark_submit.py [num_submits] [num_questions]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from app import create_app, db
+from app.cache import questionnaire_cache
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from config import Config
+
+def _make_app(cache_size):
+    tmp_dir = tempfile.mkdtemp()
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_dir, 'benchmark.db')
+        RESPONSE_ARCHIVE_DIR = os.path.join(tmp_dir, 'archive')
+        QUESTIONNAIRE_CACHE_SIZE = cache_size
+        DEBUG = False
+
+    return create_app(BenchmarkConfig), tmp_dir
+
+def run_benchmark(cache_size, num_submits, num_questions):
+    app, tmp_dir = _make_app(cache_size)
+
+    with app.app_context():
+        user = User(username='bench_user', email='bench@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        questions = []
+        for idx in range(num_questions):
+            if idx % 4 == 3:
+                questions.append({'id': idx, 'text': f'Comment {idx}', 'type': 'text'})
+            else:
+                questions.append({'id': idx, 'text': f'Question {idx}', 'type': 'multiple_choice',
+                                  'options': ['Very good', 'Good', 'Neutral', 'Bad', 'Very bad']})
+        questionnaire = Questionnaire(title='Launch survey', created_by=user.id)
+        questionnaire.set_questions(questions)
+        db.session.add(questionnaire)
+        db.session.commit()
+        questionnaire_id = questionnaire.id
+
+    answers = {
+        str(q['id']): 'Great launch, smooth signup' if q['type'] == 'text' else 'Good'
+        for q in questions
+    }
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'bench_user', 'password': 'password123'})
+
+    url = f'/api/responses/questionnaire/{questionnaire_id}'
+    start = time.perf_counter()
+    for _ in range(num_submits):
+        response = client.post(url, json={'answers': answers})
+        assert response.status_code == 201, response.status_code
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        cache = questionnaire_cache()
+        hits, misses = cache.hits, cache.misses
+
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return elapsed, hits, misses
+
+if __name__ == '__main__':
+    num_submits = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    num_questions = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    print(f"{num_submits} submits, {num_questions} questions per questionnaire")
+    results = {}
+    for label, cache_size in (('cache off', 0), ('cache on', 1024)):
+        elapsed, hits, misses = run_benchmark(cache_size, num_submits, num_questions)
+        results[label] = elapsed
+        print(f"{label:10s} {num_submits / elapsed:8.1f} submits/s  "
+              f"{elapsed / num_submits * 1000:6.2f} ms/submit  (hits={hits}, misses={misses})")
+    print(f"Speedup: {results['cache off'] / results['cache on']:.2f}x")
@@ -0,0 +1,103 @@
+"""Benchmark sustained submit throughput and latency: per-request commits vs. write-behind.
+
+Usage: python benchmark_write_behind.py [num_submits] [threads]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from app import create_app, db
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from app.models.response import Response
+from config import Config
+
+def _make_app(write_behind):
+    tmp_dir = tempfile.mkdtemp()
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_dir, 'benchmark.db')
+        RESPONSE_ARCHIVE_DIR = os.path.join(tmp_dir, 'archive')
+        WRITE_BEHIND_ENABLED = write_behind
+        WRITE_BEHIND_LOG_DIR = os.path.join(tmp_dir, 'write_behind')
+        DEBUG = False
+
+    return create_app(BenchmarkConfig), tmp_dir
+
+def _percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run_benchmark(write_behind, num_submits, num_threads):
+    app, tmp_dir = _make_app(write_behind)
+
+    with app.app_context():
+        user = User(username='bench_user', email='bench@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        questionnaire = Questionnaire(title='Launch survey', created_by=user.id)
+        questionnaire.set_questions([
+            {'id': 0, 'text': 'How was it?', 'type': 'multiple_choice', 'options': ['Good', 'Bad']},
+            {'id': 1, 'text': 'Anything else?', 'type': 'text'},
+        ])
+        db.session.add(questionnaire)
+        db.session.commit()
+        url = f'/api/responses/questionnaire/{questionnaire.id}'
+
+    latencies = []
+    errors = []
+    per_thread = num_submits // num_threads
+
+    def worker():
+        client = app.test_client()
+        client.post('/api/auth/login', json={'username': 'bench_user', 'password': 'password123'})
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            response = client.post(url, json={'answers': {'0': 'Good', '1': f'smooth launch {i}'}})
+            local.append(time.perf_counter() - start)
+            if response.status_code not in (201, 202):
+                errors.append(response.status_code)
+        latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # Time until every acknowledged response is actually in the database
+    drain_start = time.perf_counter()
+    with app.app_context():
+        while Response.query.count() < len(latencies) - len(errors):
+            time.sleep(0.01)
+    drain = time.perf_counter() - drain_start
+
+    flusher = app.extensions.get('write_behind')
+    if flusher is not None:
+        flusher.shutdown()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': _percentile(latencies, 50),
+        'p99': _percentile(latencies, 99),
+        'drain': drain,
+        'errors': len(errors)
+    }
+
+if __name__ == '__main__':
+    num_submits = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    num_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    print(f"{num_submits} submits from {num_threads} threads")
+    for label, write_behind in (('per-request commit', False), ('write-behind', True)):
+        r = run_benchmark(write_behind, num_submits, num_threads)
+        print(f"{label:20s} {r['throughput']:8.1f} submits/s  p50 {r['p50'] * 1000:6.2f} ms  "
+              f"p99 {r['p99'] * 1000:6.2f} ms  drain {r['drain'] * 1000:6.1f} ms  errors {r['errors']}")
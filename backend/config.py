@@ -6,6 +6,27 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///questionnaire.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Create missing tables/indexes on every startup. Set SCHEMA_CHECK_ON_STARTUP=0
+    # in production and run `flask --app run init-db` once per deploy instead.
+    # Either way, migrating existing data (e.g. backfilling the answer search
+    # index) only happens in init-db.
+    SCHEMA_CHECK_ON_STARTUP = os.environ.get('SCHEMA_CHECK_ON_STARTUP', '1') != '0'
+    
+    # Questionnaire definition cache (size 0 disables it). PUT/DELETE only
+    # invalidate the local process; other workers may serve an edited
+    # definition for up to the TTL. Submits still re-check that it exists.
+    QUESTIONNAIRE_CACHE_SIZE = int(os.environ.get('QUESTIONNAIRE_CACHE_SIZE', 1024))
+    QUESTIONNAIRE_CACHE_TTL = int(os.environ.get('QUESTIONNAIRE_CACHE_TTL', 30))  # seconds
+    
+    # Write-behind submission: acknowledge submits once they are in a local
+    # fsynced log and insert them into the database in batches
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '0') == '1'
+    WRITE_BEHIND_LOG_DIR = os.environ.get('WRITE_BEHIND_LOG_DIR')  # defaults to <instance>/write_behind
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.05))  # seconds
+    
+    # Archived (cold) responses; defaults to <instance>/response_archive
+    RESPONSE_ARCHIVE_DIR = os.environ.get('RESPONSE_ARCHIVE_DIR')
+    
     # Security
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
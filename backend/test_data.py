@@ -1,7 +1,8 @@
-from app import create_app, db
+from app import create_app, db, init_schema
 from app.models.user import User
 from app.models.questionnaire import Questionnaire
 from app.models.response import Response
+from app.search import rebuild_answer_index
 from datetime import datetime, timedelta
 import random
 import json
@@ -12,7 +13,7 @@ def create_test_data():
     with app.app_context():
         # Clear existing data
         db.drop_all()
-        db.create_all()
+        init_schema()
         
         # Create test user
         user = User(username='test_user', email='test@example.com')
@@ -83,6 +84,10 @@ def create_test_data():
         
         db.session.commit()
         
+        # Responses were inserted directly, so index their free-text answers
+        rebuild_answer_index()
+        db.session.commit()
+        
         print("Test data created successfully!")
         print(f"Login credentials - Username: test_user, Password: password123")
         print(f"Questionnaire ID: {questionnaire.id}")
@@ -0,0 +1,145 @@
+import logging
+import os
+import pytest
+from sqlalchemy import text
+from app import create_app, db, migrate_schema
+from app.archive import all_responses, archive_questionnaire, find_archived_responses, partition_files
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from app.models.response import Response
+from app.search import question_top_terms, search_answers
+from config import Config
+
+def make_app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        RESPONSE_ARCHIVE_DIR = str(tmp_path / 'archive')
+        WRITE_BEHIND_ENABLED = False
+        TESTING = True
+
+    return create_app(TestConfig)
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = User(username='test_user', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        questionnaire = Questionnaire(title='Survey', created_by=user.id)
+        questionnaire.set_questions([{'id': 0, 'text': 'Comments', 'type': 'text'}])
+        db.session.add(questionnaire)
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'test_user', 'password': 'password123'})
+    return client
+
+def submit(client, comment):
+    response = client.post('/api/responses/questionnaire/1', json={'answers': {'0': comment}})
+    return response.get_json()['id']
+
+def make_legacy_response_table():
+    """Recreate the response table as it was before ids became monotonic"""
+    sql = db.session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'response'"
+    )).scalar()
+    db.session.execute(text("DROP TABLE response"))
+    db.session.execute(text(sql.replace('AUTOINCREMENT', '')))
+    db.session.commit()
+
+def test_archive_moves_rows_out_of_table_and_index(app, client):
+    ids = [submit(client, 'refund please %d' % i) for i in range(3)]
+
+    with app.app_context():
+        assert archive_questionnaire(1) == 3
+
+        assert Response.query.count() == 0
+        assert len(partition_files(1)) == 1
+        assert search_answers(1, 'refund')['total_matches'] == 0
+        assert question_top_terms(1, 0) == []
+        assert sorted(r.id for r in all_responses(1)) == ids
+
+    assert client.get('/api/responses/%d' % ids[1]).get_json()['answers'] == {'0': 'refund please 1'}
+    assert len(client.get('/api/responses/user/1').get_json()) == 3
+
+def test_hot_and_archived_copy_of_a_response_is_read_once(app, client):
+    for i in range(3):
+        submit(client, 'comment %d' % i)
+
+    with app.app_context():
+        archive_questionnaire(1)
+        # A crash after writing the partition but before deleting the rows
+        # leaves the same response in both places
+        copy = all_responses(1)[0]
+        db.session.add(Response(**{c.name: getattr(copy, c.name) for c in Response.__table__.columns}))
+        db.session.commit()
+
+        assert Response.query.count() == 1
+        assert len(all_responses(1)) == 3
+
+def test_new_responses_never_reuse_archived_ids(app, client):
+    ids = [submit(client, 'comment %d' % i) for i in range(3)]
+
+    with app.app_context():
+        archive_questionnaire(1)
+
+    assert submit(client, 'after archiving') == max(ids) + 1
+
+def test_init_db_migrates_legacy_response_table(app, client, tmp_path, caplog):
+    with app.app_context():
+        make_legacy_response_table()
+    ids = [submit(client, 'comment %d' % i) for i in range(3)]
+    with app.app_context():
+        archive_questionnaire(1)
+
+    with caplog.at_level(logging.WARNING, logger='app.archive'):
+        restarted = make_app(tmp_path)
+    assert 'init-db' in caplog.text
+
+    with restarted.app_context():
+        migrate_schema()
+        sql = db.session.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'response'"
+        )).scalar()
+        assert 'AUTOINCREMENT' in sql
+
+    assert submit(client, 'after migrating') == max(ids) + 1
+
+def test_archive_streams_batches_into_one_partition(app, client):
+    ids = [submit(client, 'comment %d' % i) for i in range(5)]
+
+    with app.app_context():
+        assert archive_questionnaire(1, batch_size=2) == 5
+
+        files = partition_files(1)
+        assert len(files) == 1
+        assert os.path.basename(files[0]).endswith('-%d-%d.arrow' % (ids[0], ids[-1]))
+        assert Response.query.count() == 0
+        assert sorted(r.id for r in all_responses(1)) == ids
+
+def test_lookup_by_id_skips_partitions_outside_its_range(app, client, monkeypatch):
+    import pyarrow as pa
+
+    with app.app_context():
+        for _ in range(2):
+            ids = [submit(client, 'comment') for _ in range(3)]
+            archive_questionnaire(1)
+        newest = partition_files(1)[-1]
+
+        opened = []
+        open_file = pa.ipc.open_file
+        monkeypatch.setattr(pa.ipc, 'open_file', lambda path, **kw: opened.append(path) or open_file(path, **kw))
+
+        assert [r.id for r in find_archived_responses('id', ids[1])] == [ids[1]]
+        assert set(opened) == {newest}
+
+        # Out of every range: nothing opened; by user: only the user_id column
+        opened.clear()
+        assert find_archived_responses('id', ids[-1] + 100) == []
+        assert find_archived_responses('user_id', 99) == []
+        assert len(opened) == 2
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import text
+from app import create_app, db
+from app.cache import QuestionnaireCache
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from config import Config
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        RESPONSE_ARCHIVE_DIR = str(tmp_path / 'archive')
+        WRITE_BEHIND_ENABLED = False
+        TESTING = True
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        user = User(username='test_user', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        for title in ('First', 'Second', 'Third'):
+            questionnaire = Questionnaire(title=title, created_by=user.id)
+            questionnaire.set_questions([{'id': 0, 'text': 'Comments', 'type': 'text'}])
+            db.session.add(questionnaire)
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'test_user', 'password': 'password123'})
+    return client
+
+def set_title(questionnaire_id, title):
+    """Change a questionnaire the way another worker would: without invalidating"""
+    db.session.execute(text("UPDATE questionnaire SET title = :title WHERE id = :id"),
+                       {'title': title, 'id': questionnaire_id})
+    db.session.commit()
+
+def test_put_and_delete_invalidate(app, client):
+    assert client.get('/api/questionnaires/1').get_json()['title'] == 'First'
+
+    client.put('/api/questionnaires/1', json={'title': 'Renamed'})
+    assert client.get('/api/questionnaires/1').get_json()['title'] == 'Renamed'
+
+    client.delete('/api/questionnaires/1')
+    assert client.get('/api/questionnaires/1').status_code == 404
+
+def test_entries_are_served_until_invalidated_or_expired(app):
+    cache = QuestionnaireCache(ttl=60)
+    with app.app_context():
+        assert cache.get(1).title == 'First'
+        set_title(1, 'Renamed')
+
+        assert cache.get(1).title == 'First'
+        cache.invalidate(1)
+        assert cache.get(1).title == 'Renamed'
+
+        expiring = QuestionnaireCache(ttl=0)
+        expiring.get(1)
+        set_title(1, 'Renamed again')
+        assert expiring.get(1).title == 'Renamed again'
+
+def test_load_racing_an_invalidation_is_not_cached(app):
+    cache = QuestionnaireCache()
+    load = cache._load
+
+    def racing_load(questionnaire_id, version):
+        definition = load(questionnaire_id, version)
+        # A PUT commits and invalidates after this load read the old row
+        set_title(questionnaire_id, 'Renamed')
+        cache.invalidate(questionnaire_id)
+        return definition
+
+    with app.app_context():
+        cache._load = racing_load
+        assert cache.get(1).title == 'First'  # The caller still gets what it read
+
+        cache._load = load
+        assert cache.get(1).title == 'Renamed'
+        assert cache.misses == 2
+
+def test_verify_detects_deletes_by_other_workers(app):
+    cache = QuestionnaireCache()
+    with app.app_context():
+        cache.get(1)
+        db.session.execute(text("DELETE FROM questionnaire WHERE id = 1"))
+        db.session.commit()
+
+        assert cache.get(1) is not None  # Reads may serve it until the TTL
+        assert cache.get(1, verify=True) is None
+        assert cache.get(1) is None
+
+def test_least_recently_used_entry_is_evicted(app):
+    cache = QuestionnaireCache(maxsize=2)
+    with app.app_context():
+        cache.get(1)
+        cache.get(2)
+        cache.get(1)
+        cache.get(3)
+
+        assert list(cache._entries) == [1, 3]
@@ -0,0 +1,153 @@
+import json
+import logging
+import threading
+import pytest
+from sqlalchemy import text
+from app import create_app, db, migrate_schema
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from app.models.response import Response
+from app.search import question_top_terms, rebuild_answer_index, search_answers
+from config import Config
+
+QUESTIONS = [
+    {'id': 0, 'text': 'Rate us', 'type': 'multiple_choice', 'options': ['Good', 'Bad']},
+    {'id': 1, 'text': 'What did you like?', 'type': 'text'},
+    {'id': 2, 'text': 'What should we improve?', 'type': 'textarea'},
+]
+
+def make_app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        RESPONSE_ARCHIVE_DIR = str(tmp_path / 'archive')
+        WRITE_BEHIND_ENABLED = False
+        TESTING = True
+
+    return create_app(TestConfig)
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = User(username='test_user', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        for title in ('Survey', 'Other survey'):
+            questionnaire = Questionnaire(title=title, created_by=user.id)
+            questionnaire.set_questions(QUESTIONS)
+            db.session.add(questionnaire)
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'test_user', 'password': 'password123'})
+    return client
+
+def submit(client, answers, questionnaire_id=1):
+    return client.post('/api/responses/questionnaire/%d' % questionnaire_id, json={'answers': answers})
+
+@pytest.mark.parametrize('answers', [['refund please'], 'refund please', 42])
+def test_submit_rejects_non_dict_answers(app, client, answers):
+    assert submit(client, answers).status_code == 400
+    with app.app_context():
+        assert Response.query.count() == 0
+
+def test_rebuild_skips_non_dict_answers(app):
+    with app.app_context():
+        db.session.add(Response(questionnaire_id=1, user_id=1, answers=json.dumps(['refund'])))
+        db.session.add(Response(questionnaire_id=1, user_id=1, answers=json.dumps({'1': 'refund'})))
+        db.session.commit()
+
+        rebuild_answer_index()
+        db.session.commit()
+
+        assert search_answers(1, 'refund')['total_matches'] == 1
+
+def test_search_ranks_and_scopes(app, client):
+    submit(client, {'0': 'Good', '1': 'refund was quick', '2': 'nothing'})
+    submit(client, {'0': 'Bad', '1': 'no refund', '2': 'refund refund refund'})
+    submit(client, {'0': 'Refund', '1': 'fast delivery', '2': 'cheaper'})
+    submit(client, {'1': 'refund'}, questionnaire_id=2)
+
+    with app.app_context():
+        result = search_answers(1, 'refund')
+        # Choice answers aren't indexed and other questionnaires don't leak in
+        assert result['total_matches'] == 3
+        assert [hit['response_id'] for hit in result['results']] == [2, 1]
+        assert {m['question_id'] for m in result['results'][0]['matches']} == {'1', '2'}
+        assert '[refund]' in result['results'][0]['matches'][0]['snippet']
+
+        scoped = search_answers(1, 'refund', question_id=1)
+        assert scoped['total_matches'] == 2
+        assert search_answers(1, 'refund quick')['total_matches'] == 1
+
+def test_search_endpoint(client):
+    submit(client, {'1': 'refund was quick'})
+
+    response = client.get('/api/analytics/questionnaire/1/search?q=refund&limit=-5')
+
+    assert response.status_code == 200
+    assert response.get_json()['total_matches'] == 1
+    assert len(response.get_json()['results']) == 1
+    assert client.get('/api/analytics/questionnaire/1/search?q=').status_code == 400
+
+def test_startup_leaves_backfill_to_init_db(app, tmp_path, caplog):
+    with app.app_context():
+        # An index built by an older version, plus rows it has never seen
+        db.session.execute(text("DELETE FROM answer_index_version"))
+        db.session.add(Response(questionnaire_id=1, user_id=1, answers=json.dumps({'1': 'refund'})))
+        db.session.commit()
+
+    with caplog.at_level(logging.WARNING, logger='app.search'):
+        restarted = make_app(tmp_path)
+
+    assert 'init-db' in caplog.text
+    with restarted.app_context():
+        assert search_answers(1, 'refund')['total_matches'] == 0
+        migrate_schema()
+        assert search_answers(1, 'refund')['total_matches'] == 1
+
+def test_term_counts_skip_stopwords(app, client):
+    submit(client, {'1': 'The refund was late, so I asked for a refund'})
+
+    with app.app_context():
+        terms = question_top_terms(1, 1)
+        assert terms == [
+            {'term': 'refund', 'count': 2},
+            {'term': 'asked', 'count': 1},
+            {'term': 'late', 'count': 1},
+        ]
+        # Stopwords are still searchable
+        assert search_answers(1, 'the refund')['total_matches'] == 1
+
+def wait_for_reindex():
+    for thread in threading.enumerate():
+        if thread.name.startswith('reindex-questionnaire-'):
+            thread.join()
+
+def test_put_reindexes_in_background_when_text_questions_change(app, client):
+    submit(client, {'1': 'refund was quick', '2': 'refund faster'})
+    changed = [dict(q) for q in QUESTIONS]
+    changed[2]['type'] = 'multiple_choice'
+
+    assert client.put('/api/questionnaires/1', json={'questions': changed}).status_code == 200
+    wait_for_reindex()
+
+    with app.app_context():
+        assert search_answers(1, 'refund')['total_matches'] == 1
+        assert question_top_terms(1, 2) == []
+        assert question_top_terms(1, 1)[0] == {'term': 'quick', 'count': 1}
+
+        # New submits are indexed with the new questions
+        submit(client, {'1': 'refund', '2': 'refund'})
+        assert search_answers(1, 'refund')['total_matches'] == 2
+
+def test_put_skips_reindex_when_text_questions_unchanged(app, client):
+    renamed = [dict(q, text='Anything else?') for q in QUESTIONS]
+
+    client.put('/api/questionnaires/1', json={'title': 'Renamed', 'questions': renamed})
+
+    assert not [t for t in threading.enumerate() if t.name.startswith('reindex-questionnaire-')]
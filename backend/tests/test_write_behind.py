@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import create_app, db, search
+from app.models.user import User
+from app.models.questionnaire import Questionnaire
+from app.models.response import Response
+from config import Config
+
+ORPHAN = 'worker-1-1'
+
+def make_app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        RESPONSE_ARCHIVE_DIR = str(tmp_path / 'archive')
+        WRITE_BEHIND_ENABLED = True
+        WRITE_BEHIND_LOG_DIR = str(tmp_path / 'write_behind')
+        WRITE_BEHIND_FLUSH_INTERVAL = 3600  # Only recovery and shutdown flush
+        TESTING = True
+
+    return create_app(TestConfig)
+
+def record(questionnaire_id, user_id, answer):
+    now = datetime.utcnow().isoformat()
+    return {
+        'questionnaire_id': questionnaire_id,
+        'user_id': user_id,
+        'answers': json.dumps({'0': answer}),
+        'started_at': now,
+        'submitted_at': now,
+        'completion_time': 0.0
+    }
+
+def write_segment(path, seq, records, tail=''):
+    with open(os.path.join(path, '%020d-%06d.log' % (seq, seq)), 'w') as segment:
+        for r in records:
+            segment.write(json.dumps(r) + '\n')
+        segment.write(tail)
+
+def write_orphan(root, questionnaire_id, user_id, count):
+    """Lay out a log directory as a crashed process would have left it"""
+    path = os.path.join(root, ORPHAN)
+    os.makedirs(path)
+    open(os.path.join(path, 'LOCK'), 'w').close()
+    write_segment(path, 1, [record(questionnaire_id, user_id, 'logged answer %d' % i) for i in range(count)],
+                  tail='{"questionnaire_id": 1, "user_')  # Torn, never acknowledged
+    return path
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = User(username='test_user', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        questionnaire = Questionnaire(title='Survey', created_by=user.id)
+        questionnaire.set_questions([{'id': 0, 'text': 'Comments', 'type': 'text'}])
+        db.session.add(questionnaire)
+        db.session.commit()
+        app.config['TEST_IDS'] = (questionnaire.id, user.id)
+    yield app
+    app.extensions['write_behind'].shutdown()
+
+def test_create_app_does_not_start_write_behind(app, tmp_path):
+    orphan = write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], *app.config['TEST_IDS'], count=3)
+
+    # CLI commands and scripts call create_app() without serving requests
+    make_app(tmp_path)
+
+    assert app.extensions['write_behind'].log is None
+    assert os.path.isdir(orphan)
+    with app.app_context():
+        assert Response.query.count() == 0
+
+def test_first_request_replays_orphaned_log(app):
+    orphan = write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], *app.config['TEST_IDS'], count=3)
+
+    app.test_client().get('/api/questionnaires/1')
+
+    assert not os.path.exists(orphan)
+    with app.app_context():
+        assert Response.query.count() == 3
+        assert db.session.execute(text("SELECT COUNT(*) FROM write_behind_segment")).scalar() == 0
+
+def test_concurrent_recovery_replays_orphan_once(app, tmp_path):
+    write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], *app.config['TEST_IDS'], count=15)
+    apps = [app] + [make_app(tmp_path) for _ in range(5)]
+    start = threading.Barrier(len(apps))
+    errors = []
+
+    def serve(worker_app):
+        start.wait()
+        try:
+            worker_app.extensions['write_behind'].ensure_started()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=serve, args=(a,)) for a in apps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for worker_app in apps[1:]:
+        worker_app.extensions['write_behind'].shutdown()
+
+    assert errors == []
+    with app.app_context():
+        assert Response.query.count() == 15
+
+def test_submit_rejects_non_object_answers_before_logging(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'test_user', 'password': 'password123'})
+
+    response = client.post('/api/responses/questionnaire/1', json={'answers': ['not', 'an', 'object']})
+
+    assert response.status_code == 400
+    assert os.path.getsize(app.extensions['write_behind'].log._segment.name) == 0
+
+def test_malformed_records_are_skipped(app):
+    questionnaire_id, user_id = app.config['TEST_IDS']
+    orphan = write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], questionnaire_id, user_id, count=2)
+    bad = dict(record(questionnaire_id, user_id, ''), answers=json.dumps(['list']))
+    write_segment(orphan, 2, [bad, {'user_id': user_id}, [1, 2], record(questionnaire_id, user_id, 'fine')])
+
+    app.extensions['write_behind'].ensure_started()
+
+    assert not os.path.exists(orphan)
+    with app.app_context():
+        assert Response.query.count() == 3
+
+def test_failing_segment_is_quarantined_and_the_rest_flushed(app, monkeypatch):
+    questionnaire_id, user_id = app.config['TEST_IDS']
+    orphan = write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], questionnaire_id, user_id, count=2)
+    write_segment(orphan, 2, [record(questionnaire_id, user_id, 'poison')])
+    write_segment(orphan, 3, [record(questionnaire_id, user_id, 'after the poison')])
+    index_response = search.index_response
+
+    def failing_index(response, questions):
+        if 'poison' in response.answers and 'after' not in response.answers:
+            raise RuntimeError('cannot index')
+        index_response(response, questions)
+
+    monkeypatch.setattr(search, 'index_response', failing_index)
+    app.extensions['write_behind'].ensure_started()
+
+    failed = os.path.join(app.config['WRITE_BEHIND_LOG_DIR'], 'failed')
+    assert os.listdir(failed) == ['%s-%020d-%06d.log' % (ORPHAN, 2, 2)]
+    assert not os.path.exists(orphan)
+    with app.app_context():
+        assert Response.query.count() == 3
+
+def test_shutdown_keeps_segments_when_database_is_unavailable(app, monkeypatch):
+    flusher = app.extensions['write_behind']
+    flusher.ensure_started()
+    with app.app_context():
+        flusher.log.append(Response(questionnaire_id=1, user_id=1, answers=json.dumps({'0': 'kept'}),
+                                    started_at=datetime.utcnow(), submitted_at=datetime.utcnow()))
+
+    def locked(*args, **kwargs):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(flusher, '_flush_segment', locked)
+    flusher.shutdown()  # Must not raise
+
+    segments = [name for name in os.listdir(flusher.log.path) if name.endswith('.log')]
+    assert len(segments) == 1
+    assert not os.path.exists(os.path.join(app.config['WRITE_BEHIND_LOG_DIR'], 'failed'))
+
+def test_existence_is_checked_once_per_questionnaire(app, monkeypatch):
+    from app.cache import QuestionnaireCache
+
+    checks = []
+    exists = QuestionnaireCache._exists
+    monkeypatch.setattr(QuestionnaireCache, '_exists', lambda self, qid: checks.append(qid) or exists(self, qid))
+    questionnaire_id, user_id = app.config['TEST_IDS']
+    with app.app_context():
+        app.extensions['questionnaire_cache'].get(questionnaire_id)  # Cached, so get() would verify
+    write_orphan(app.config['WRITE_BEHIND_LOG_DIR'], questionnaire_id, user_id, count=20)
+
+    app.extensions['write_behind'].ensure_started()
+
+    assert checks == [questionnaire_id]
+    with app.app_context():
+        assert Response.query.count() == 20